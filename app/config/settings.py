@@ -1,70 +1,196 @@
 import os
 import argparse
+import functools
+import logging
+import sys
+from dataclasses import dataclass
+from pathlib import Path
+from types import SimpleNamespace
+from typing import List, Optional
 from dotenv import load_dotenv
 
-# Load environment variables (for reference, not used directly)
-load_dotenv()
+logger = logging.getLogger(__name__)
 
-# Command line argument parsing
-def parse_args():
-    parser = argparse.ArgumentParser(description='MCP Trino Python Server')
-    
+@functools.cache
+def _load_env() -> None:
+    """Load environment variables from .env (for reference, not used directly), once per process."""
+    env_path = Path(os.getenv('DOTENV_PATH', '.env'))
+    if env_path.is_file():
+        load_dotenv(env_path)
+
+
+# Command line options: flag -> (dest, type, default, help)
+_OPTIONS = {
     # Presto connection parameters
-    parser.add_argument('--host', default="localhost", help='Presto host (default: localhost)')
-    parser.add_argument('--port', default="8080", help='Presto port (default: 8080)')
-    parser.add_argument('--protocol', default="https", help='Presto protocol (http/https) (default: https)')
-    parser.add_argument('--username', required=True, help='Presto username (Required)')
-    parser.add_argument('--password', required=True, help='Presto password (Required)')
-    parser.add_argument('--catalog', default='hive', help='Trino catalog name (default: hive)')
-    parser.add_argument('--schema', default="default", help='Presto schema (default: default)')
-    parser.add_argument('--source', default="mcp-trino-python", help='Presto source identifier (default: mcp-trino-python). Use {username} to include username.')
-    parser.add_argument('--resource-group', default=None, help='Trino resource group or queue name')
-    
+    '--host': ('host', str, "localhost", 'Presto host (default: localhost)'),
+    '--port': ('port', int, 8080, 'Presto port (default: 8080)'),
+    '--protocol': ('protocol', str, "https", 'Presto protocol (http/https) (default: https)'),
+    '--username': ('username', str, None, 'Presto username (Required)'),
+    '--password': ('password', str, None, 'Presto password (Required)'),
+    '--catalog': ('catalog', str, 'hive', 'Trino catalog name (default: hive)'),
+    '--schema': ('schema', str, "default", 'Presto schema (default: default)'),
+    '--source': ('source', str, "mcp-trino-python", 'Presto source identifier (default: mcp-trino-python). Use {username} to include username.'),
+    '--resource-group': ('resource_group', str, None, 'Trino resource group or queue name'),
+
     # Timeout settings
-    parser.add_argument('--connect-timeout', type=int, default=10, help='Connection timeout in seconds (default: 10)')
-    parser.add_argument('--query-timeout', type=int, default=300, help='Query timeout in seconds (default: 300)')
-    
+    '--connect-timeout': ('connect_timeout', int, 10, 'Connection timeout in seconds (default: 10)'),
+    '--query-timeout': ('query_timeout', int, 300, 'Query timeout in seconds (default: 300)'),
+
+    # Connection pool settings
+    '--min-connections': ('min_connections', int, 2, 'Connections kept open in the pool (default: 2)'),
+    '--max-connections': ('max_connections', int, 10, 'Maximum concurrent Presto connections (default: 10)'),
+}
+
+# Boolean switches: flag -> (dest, help)
+_SWITCHES = {
     # Verbose output settings
-    parser.add_argument('--verbose', action='store_true', help='Show verbose output including credentials')
-    
-    return parser.parse_args()
-
-# Parse command line arguments
-args = parse_args()
-
-# Presto connection settings
-PRESTO_HOST = args.host
-PRESTO_PORT = args.port
-PRESTO_PROTOCOL = args.protocol
-PRESTO_USERNAME = args.username
-PRESTO_PASSWORD = args.password
-PRESTO_SCHEMA = args.schema
-PRESTO_RESOURCE_GROUP = args.resource_group
-PRESTO_CATALOG = args.catalog
-
-# Process source URL (allows using {username} variable in source)
-PRESTO_SOURCE = args.source.format(username=PRESTO_USERNAME) if '{username}' in args.source else args.source
-
-# Timeout settings
-CONNECT_TIMEOUT = args.connect_timeout
-QUERY_TIMEOUT = args.query_timeout
-
-# Verbose output settings
-VERBOSE = args.verbose
-
-# Display current configuration
+    '--verbose': ('verbose', 'Show verbose output including credentials'),
+}
+
+_REQUIRED = ('username', 'password')
+
+
+def _build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description='MCP Trino Python Server')
+    for flag, (dest, type_, default, help_) in _OPTIONS.items():
+        if dest in _REQUIRED:
+            parser.add_argument(flag, required=True, help=help_)
+        elif type_ is str:
+            parser.add_argument(flag, default=default, help=help_)
+        else:
+            parser.add_argument(flag, type=type_, default=default, help=help_)
+    for flag, (dest, help_) in _SWITCHES.items():
+        parser.add_argument(flag, action='store_true', help=help_)
+    return parser
+
+
+def _fast_parse(argv: List[str]) -> Optional[SimpleNamespace]:
+    """
+    Parse the common ``--flag value`` / ``--flag=value`` forms without argparse.
+
+    Returns None for anything it does not fully understand (help, unknown or
+    abbreviated flags, missing values, bad integers, missing required options)
+    so the caller can fall back to argparse and its error reporting.
+    """
+    out = {dest: default for dest, _, default, _ in _OPTIONS.values()}
+    out.update((dest, False) for dest, _ in _SWITCHES.values())
+
+    it = iter(argv)
+    for tok in it:
+        flag, sep, value = tok.partition('=')
+        if flag in _SWITCHES and not sep:
+            out[_SWITCHES[flag][0]] = True
+            continue
+        if flag not in _OPTIONS:
+            return None
+        if not sep:
+            value = next(it, None)
+            if value is None or value.startswith('-'):
+                return None
+        dest, type_, _, _ = _OPTIONS[flag]
+        try:
+            out[dest] = type_(value)
+        except ValueError:
+            return None
+
+    if any(out[dest] is None for dest in _REQUIRED):
+        return None
+    return SimpleNamespace(**out)
+
+
+# Command line argument parsing
+def parse_args(argv: Optional[List[str]] = None):
+    if argv is None:
+        argv = sys.argv[1:]
+    args = _fast_parse(argv)
+    if args is None:
+        args = _build_parser().parse_args(argv)
+    return args
+
+
+@dataclass(frozen=True, slots=True)
+class Settings:
+    """Resolved server configuration, built once per process by get_settings()."""
+
+    # Presto connection settings
+    PRESTO_HOST: str
+    PRESTO_PORT: int
+    PRESTO_PROTOCOL: str
+    PRESTO_USERNAME: str
+    PRESTO_PASSWORD: str
+    PRESTO_SCHEMA: str
+    PRESTO_RESOURCE_GROUP: Optional[str]
+    PRESTO_CATALOG: str
+    PRESTO_SOURCE: str
+
+    # Timeout settings
+    CONNECT_TIMEOUT: int
+    QUERY_TIMEOUT: int
+
+    # Connection pool settings
+    MIN_CONNECTIONS: int
+    MAX_CONNECTIONS: int
+
+    # Verbose output settings
+    VERBOSE: bool
+
+    # Include full tracebacks in tool error responses (MCP_DEBUG=1)
+    DEBUG: bool
+
+
+@functools.lru_cache(maxsize=1)
+def get_settings() -> Settings:
+    """
+    Parse the command line once and return the cached settings.
+
+    Returns:
+        The process-wide Settings instance
+    """
+    _load_env()
+    args = parse_args()
+
+    # Every tool call needs a pool connection and an executor thread
+    if not 1 <= args.min_connections <= args.max_connections:
+        _build_parser().error(
+            f"connection limits must satisfy 1 <= --min-connections <= --max-connections, "
+            f"got {args.min_connections} and {args.max_connections}")
+
+    # Process source URL (allows using {username} variable in source)
+    source = args.source.format(username=args.username) if '{username}' in args.source else args.source
+
+    return Settings(
+        PRESTO_HOST=args.host,
+        PRESTO_PORT=args.port,
+        PRESTO_PROTOCOL=args.protocol.lower(),
+        PRESTO_USERNAME=args.username,
+        PRESTO_PASSWORD=args.password,
+        PRESTO_SCHEMA=args.schema,
+        PRESTO_RESOURCE_GROUP=args.resource_group,
+        PRESTO_CATALOG=args.catalog,
+        PRESTO_SOURCE=source,
+        CONNECT_TIMEOUT=args.connect_timeout,
+        QUERY_TIMEOUT=args.query_timeout,
+        MIN_CONNECTIONS=args.min_connections,
+        MAX_CONNECTIONS=args.max_connections,
+        VERBOSE=args.verbose,
+        DEBUG=os.getenv('MCP_DEBUG') == '1',
+    )
+
+# Display current configuration (logged to stderr; stdout carries the MCP protocol)
 def print_config():
-    print("=== MCP Trino Python Server Configuration ===")
-    print(f"Host: {PRESTO_HOST}")
-    print(f"Port: {PRESTO_PORT}")
-    print(f"Protocol: {PRESTO_PROTOCOL}")
-    print(f"Username: {PRESTO_USERNAME}")
-    print(f"Catalog: {PRESTO_CATALOG}")
-    print(f"Schema: {PRESTO_SCHEMA}")
-    if VERBOSE:
-        print(f"Connect Timeout: {CONNECT_TIMEOUT}s")
-        print(f"Query Timeout: {QUERY_TIMEOUT}s")
-        print(f"Source: {PRESTO_SOURCE}")
-        print(f"Resource Group: {PRESTO_RESOURCE_GROUP}")
-        print(f"Password: {'*' * (len(PRESTO_PASSWORD) if PRESTO_PASSWORD else 0)}")
-    print("==========================================") 
\ No newline at end of file
+    settings = get_settings()
+    logger.info("=== MCP Trino Python Server Configuration ===")
+    logger.info("Host: %s", settings.PRESTO_HOST)
+    logger.info("Port: %s", settings.PRESTO_PORT)
+    logger.info("Protocol: %s", settings.PRESTO_PROTOCOL)
+    logger.info("Username: %s", settings.PRESTO_USERNAME)
+    logger.info("Catalog: %s", settings.PRESTO_CATALOG)
+    logger.info("Schema: %s", settings.PRESTO_SCHEMA)
+    if settings.VERBOSE:
+        logger.info("Connect Timeout: %ss", settings.CONNECT_TIMEOUT)
+        logger.info("Query Timeout: %ss", settings.QUERY_TIMEOUT)
+        logger.info("Connections: %s-%s", settings.MIN_CONNECTIONS, settings.MAX_CONNECTIONS)
+        logger.info("Source: %s", settings.PRESTO_SOURCE)
+        logger.info("Resource Group: %s", settings.PRESTO_RESOURCE_GROUP)
+        logger.info("Password: %s", '*' * (len(settings.PRESTO_PASSWORD) if settings.PRESTO_PASSWORD else 0))
+    logger.info("==========================================")
@@ -1,2 +1,3 @@
 from app.services.presto_service import PrestoService
-from app.services.connection_pool import get_connection_pool, PrestoConnectionPool 
\ No newline at end of file
+from app.services.connection_pool import get_connection_pool, check_host_connectivity, PrestoConnectionPool
+from app.services.metadata_cache import MetadataCache
@@ -1,11 +1,85 @@
+import contextlib
+import functools
+import logging
+import queue
 import threading
 import time
-from typing import Optional, List, Dict, Any
-from pyhive import presto
-import app.config.settings as settings
+from types import MappingProxyType
+from typing import Optional, Dict, Any, Iterator, Mapping
+from trino import dbapi
+from trino.auth import BasicAuthentication
+from app.config.settings import get_settings
 import socket
 import requests
 
+logger = logging.getLogger(__name__)
+
+# URL prefixes to mount the adapter on per protocol; unknown protocols get both
+_ADAPTER_PREFIXES = {
+    'https': ('https://',),
+    'http': ('http://',),
+}
+
+
+def check_host_connectivity(host: str, port: int, timeout: int) -> bool:
+    """
+    Check if host port is accessible, fail fast.
+
+    Meant to be called once at startup; connections themselves rely on the
+    HTTP connect timeout and retries instead of probing before every connect.
+    """
+    start_time = time.time()
+    try:
+        # Try TCP connection (create_connection resolves IPv4 and IPv6 addresses)
+        with socket.create_connection((host, port), timeout=timeout):
+            pass
+        elapsed = time.time() - start_time
+        logger.info("✅ Host connectivity check succeeded in %.2fs", elapsed)
+        return True
+    except Exception as e:
+        elapsed = time.time() - start_time
+        logger.warning(
+            "Cannot connect to %s:%s (%.2fs): %s", host, port, elapsed, e)
+        return False
+
+
+@functools.cache
+def _build_requests_session(protocol: str, max_conn: int) -> requests.Session:
+    """
+    Create a requests session for trino connections.
+
+    Memoized: every connection built with the same settings shares one session
+    and therefore one urllib3 keep-alive pool.
+
+    Args:
+        protocol: Presto protocol (http/https), already lower-cased by settings
+        max_conn: Connection pool size, used to size the HTTP keep-alive pool
+
+    Returns:
+        The configured session
+    """
+    session = requests.Session()
+
+    # The urllib3 pool is sized to the connection pool and blocks when full, so
+    # keep-alive sockets are reused instead of being discarded and re-handshaked
+    # under concurrent load. Retries on 429/502/503/504 are left to the trino
+    # client (max_attempts, with backoff).
+    adapter = requests.adapters.HTTPAdapter(
+        pool_connections=max_conn,
+        pool_maxsize=max_conn,
+        pool_block=True)
+
+    # Only mount the required protocol
+    prefixes = _ADAPTER_PREFIXES.get(protocol)
+    if prefixes is None:
+        # For safety, if protocol is unclear, mount both
+        prefixes = ('http://', 'https://')
+        logger.warning(
+            "⚠️ Unknown protocol '%s', mounting both HTTP and HTTPS adapters", protocol)
+    for prefix in prefixes:
+        session.mount(prefix, adapter)
+    return session
+
 
 class PrestoConnectionPool:
     """
@@ -16,11 +90,11 @@ class PrestoConnectionPool:
     and recycling of connections.
     """
 
-    connect_kwargs: Dict[str, Any] = {}
-    is_valid = False
+    connect_kwargs: Mapping[str, Any] = MappingProxyType({})
 
     def __init__(self, min_conn: int = 2, max_conn: int = 10,
-                 max_idle_time: int = 600, validate_interval: int = 30):
+                 max_idle_time: int = 600, acquire_timeout: float = 30,
+                 probe_after: int = 300):
         """
         Initialize the connection pool.
 
@@ -28,205 +102,145 @@ class PrestoConnectionPool:
             min_conn: Minimum number of connections to keep in the pool
             max_conn: Maximum number of connections allowed in the pool
             max_idle_time: Maximum idle time for a connection in seconds before it's closed
-            validate_interval: Time interval in seconds to validate idle connections
+            acquire_timeout: Seconds to wait for a free connection when the pool is exhausted
+            probe_after: Seconds a connection is trusted before it is probed with SELECT 1 on checkout
         """
-        self._pool: List[Dict[str, Any]] = []  # Available connections
+        if not 1 <= min_conn <= max_conn:
+            raise ValueError(
+                f"Pool size must satisfy 1 <= min_conn <= max_conn, got {min_conn} and {max_conn}")
+
+        # Available connections; LIFO so the most recently used (warmest) one is reused first
+        self._idle: "queue.LifoQueue[Dict[str, Any]]" = queue.LifoQueue(maxsize=max_conn)
         # Connections currently in use
         self._in_use: Dict[int, Dict[str, Any]] = {}
+        # Bounds the number of checked-out connections; waiters are woken in arrival order
+        self._sem = threading.BoundedSemaphore(max_conn)
         self._min_conn: int = min_conn
         self._max_conn: int = max_conn
         self._max_idle_time: int = max_idle_time
-        self._validate_interval: int = validate_interval
+        self._acquire_timeout: float = acquire_timeout
+        self._probe_after: int = probe_after
+        # Serializes maintenance (top-up, close_all); not taken on the acquire/release path
         self._lock = threading.RLock()
-        self._last_validation_time = 0
 
+        settings = get_settings()
         if not settings.PRESTO_USERNAME or not settings.PRESTO_PASSWORD:
             raise ValueError("Presto username and password are required")
 
-        # Create requests session with proper timeout settings
-        requests_session = self._create_requests_session()
+        # Create requests session shared by all connections
+        http_session = _build_requests_session(settings.PRESTO_PROTOCOL, max_conn)
 
         # Prepare connection arguments
-        self.connect_kwargs = {
+        connect_kwargs: Dict[str, Any] = {
             "host": settings.PRESTO_HOST,
             "port": settings.PRESTO_PORT,
-            "protocol": settings.PRESTO_PROTOCOL,
-            "username": settings.PRESTO_USERNAME,
-            "password": settings.PRESTO_PASSWORD,
+            "http_scheme": settings.PRESTO_PROTOCOL,
+            "user": settings.PRESTO_USERNAME,
+            "auth": BasicAuthentication(settings.PRESTO_USERNAME, settings.PRESTO_PASSWORD),
             "schema": settings.PRESTO_SCHEMA,
-            "requests_session": requests_session
+            "http_session": http_session,
+            # (connect_timeout, read_timeout), passed by trino with every HTTP request
+            "request_timeout": (settings.CONNECT_TIMEOUT, settings.QUERY_TIMEOUT)
         }
 
-        # Add source setting
+        # Add source setting ({username} is already substituted by get_settings)
         if settings.PRESTO_SOURCE:
-            self.connect_kwargs["source"] = settings.PRESTO_SOURCE.replace(
-                "username", settings.PRESTO_USERNAME)
+            connect_kwargs["source"] = settings.PRESTO_SOURCE
 
         # Add catalog setting
         if settings.PRESTO_CATALOG:
-            self.connect_kwargs["catalog"] = settings.PRESTO_CATALOG
+            connect_kwargs["catalog"] = settings.PRESTO_CATALOG
 
-        # Check host connectivity first
-        self._check_host_connectivity(settings.PRESTO_HOST, int(
-            settings.PRESTO_PORT), settings.CONNECT_TIMEOUT)
+        # Server-side query timeout, sent as a session header with every statement
+        # instead of a separate SET SESSION round-trip per query
+        if settings.QUERY_TIMEOUT:
+            connect_kwargs["session_properties"] = {
+                "query_max_execution_time": f"{settings.QUERY_TIMEOUT}s"
+            }
 
-        # Initialize the pool with minimum connections
-        self._initialize_pool()
+        # Freeze the arguments: every connection is built from the same read-only mapping
+        self.connect_kwargs = MappingProxyType(connect_kwargs)
 
-        # Start validation thread
-        self._stop_validation = False
-        self._validation_thread = threading.Thread(
-            target=self._validation_worker, daemon=True)
-        self._validation_thread.start()
+        # Connections are opened on demand; call open_connection() min_conn times
+        # to pre-warm the pool
 
-    def _initialize_pool(self) -> None:
-        """Initialize the pool with the minimum number of connections."""
+    @property
+    def min_conn(self) -> int:
+        """Minimum number of connections kept in the pool."""
+        return self._min_conn
 
-        for _ in range(self._min_conn):
-            try:
-                conn = self._create_new_connection(self.connect_kwargs)
-                if not self.is_valid:
-                    # Check if the connection is valid
-                    self.is_valid = self.verify_connection(conn)
-
-                self._pool.append({
-                    'conn': conn,
-                    'created_time': time.time(),
-                    'last_used_time': time.time()
-                })
-            except Exception as e:
-                print(f"Error initializing connection in pool: {str(e)}")
-                # Continue trying to initialize other connections
-                continue
-
-    def _validation_worker(self) -> None:
-        """Background worker to validate connections and maintain pool size."""
-        while not self._stop_validation:
-            try:
-                self._validate_connections()
-                time.sleep(self._validate_interval)
-            except Exception as e:
-                print(f"Error in validation worker: {str(e)}")
-                time.sleep(5)  # Sleep briefly before retrying
-
-    def _validate_connections(self) -> None:
-        """Validate idle connections in the pool and remove stale ones."""
-        current_time = time.time()
+    @property
+    def max_conn(self) -> int:
+        """Maximum number of connections allowed in the pool."""
+        return self._max_conn
 
-        # Only validate at configured intervals
-        if current_time - self._last_validation_time < self._validate_interval:
-            return
+    def open_connection(self) -> bool:
+        """
+        Open a connection, verify it with SELECT 1 and add it to the idle pool.
 
-        self._last_validation_time = current_time
+        Safe to call from several threads at once, e.g. to pre-warm the pool
+        at startup so the first query finds a verified connection with a
+        warm TLS socket.
 
-        with self._lock:
-            # Check idle connections
-            valid_connections = []
-            for conn_info in self._pool:
-                conn = conn_info['conn']
-                last_used_time = conn_info['last_used_time']
-
-                # Check if connection has been idle for too long
-                if current_time - last_used_time > self._max_idle_time:
-                    try:
-                        conn.close()
-                        print(f"Closed idle connection that exceeded max idle time")
-                    except Exception as e:
-                        print(f"Error closing idle connection: {str(e)}")
-                    continue
+        Returns:
+            True if the connection was verified and added to the pool
+        """
+        try:
+            conn = self._create_new_connection()
+        except Exception as e:
+            logger.warning("Error initializing connection in pool: %s", e)
+            return False
 
-                # Validate connection is still working
-                if self.is_valid or self.verify_connection(conn):
-                    valid_connections.append(conn_info)
-                else:
-                    try:
-                        conn.close()
-                        print(f"Closed invalid connection during validation")
-                    except Exception as e:
-                        print(f"Error closing invalid connection: {str(e)}")
+        if not self.verify_connection(conn):
+            return False
+
+        try:
+            self._idle.put_nowait(self._new_conn_info(conn))
+        except queue.Full:
+            self._drop("connection over pool capacity")
+        return True
+
+    @staticmethod
+    def _new_conn_info(conn: dbapi.Connection) -> Dict[str, Any]:
+        """Wrap a fresh connection with its bookkeeping timestamps."""
+        now = time.time()
+        return {
+            'conn': conn,
+            'created_time': now,
+            'last_used_time': now,
+            'last_probed_time': now
+        }
+
+    @staticmethod
+    def _drop(reason: str) -> None:
+        """
+        Drop a connection from the pool; the caller just stops referencing it.
 
-            # Update pool with valid connections
-            self._pool = valid_connections
+        trino's Connection.close() only closes its HTTP session, which all pooled
+        connections share, so a single dropped connection is simply discarded;
+        close_all() closes the session at shutdown.
+        """
+        logger.debug("Dropped %s", reason)
 
-            # Create new connections if below minimum
-            while len(self._pool) + len(self._in_use) < self._min_conn:
+    def _top_up(self) -> None:
+        """Create new connections until the pool holds at least min_conn."""
+        with self._lock:
+            while self._idle.qsize() + len(self._in_use) < self._min_conn:
                 try:
-                    conn = self._create_new_connection(self.connect_kwargs)
-                    self._pool.append({
-                        'conn': conn,
-                        'created_time': time.time(),
-                        'last_used_time': time.time()
-                    })
-                    print(f"Added new connection to maintain minimum pool size")
+                    conn = self._create_new_connection()
+                    self._idle.put_nowait(self._new_conn_info(conn))
+                    logger.debug("Added new connection to maintain minimum pool size")
                 except Exception as e:
-                    print(
-                        f"Error creating new connection during validation: {str(e)}")
+                    logger.warning(
+                        "Error creating new connection to maintain minimum pool size: %s", e)
                     break
 
-    def _check_host_connectivity(self, host: str, port: int, timeout: int) -> bool:
-        """Check if host port is accessible, fail fast"""
-        start_time = time.time()
-        sock = None
-        try:
-            # Try TCP connection
-            sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-            sock.settimeout(timeout)
-            sock.connect((host, port))
-            elapsed = time.time() - start_time
-            print(f"✅ Host connectivity check succeeded in {elapsed:.2f}s")
-            return True
-        except Exception as e:
-            elapsed = time.time() - start_time
-            print(
-                f"Cannot connect to {host}:{port} ({elapsed:.2f}s): {str(e)}")
-            return False
-        finally:
-            if sock:
-                sock.close()
-
-    def _create_new_connection(self, connect_kwargs: Dict[str, Any]) -> presto.Connection:
+    def _create_new_connection(self) -> dbapi.Connection:
         """Create a new Presto connection."""
         # Create connection
-        conn = presto.connect(**connect_kwargs)
+        conn = dbapi.connect(**self.connect_kwargs)
         return conn
 
-    def _create_requests_session(self):
-        """Create a requests session with timeout configuration"""
-        session = requests.Session()
-
-        # Create adapter based on configured protocol
-        protocol = settings.PRESTO_PROTOCOL.lower()
-        adapter = requests.adapters.HTTPAdapter(max_retries=1)
-
-        # Only mount the required protocol
-        if protocol == 'https':
-            session.mount('https://', adapter)
-            print(f"✅ Created session with HTTPS adapter")
-        elif protocol == 'http':
-            session.mount('http://', adapter)
-            print(f"✅ Created session with HTTP adapter")
-        else:
-            # For safety, if protocol is unclear, mount both
-            session.mount('http://', adapter)
-            session.mount('https://', adapter)
-            print(
-                f"⚠️ Unknown protocol '{protocol}', mounting both HTTP and HTTPS adapters")
-
-        # Add timeout defaults by modifying requests.Session.request method
-        original_request = session.request
-
-        def request_with_timeout(*args, **kwargs):
-            # If timeout is not specified, add default timeout
-            if 'timeout' not in kwargs:
-                # Use (connect_timeout, read_timeout) format
-                kwargs['timeout'] = (
-                    settings.CONNECT_TIMEOUT, settings.QUERY_TIMEOUT)
-            return original_request(*args, **kwargs)
-
-        # Replace the original request method
-        session.request = request_with_timeout
-        return session
-
     def verify_connection(self, conn) -> bool:
         """Verify that the connection to Presto is successful."""
         cursor = conn.cursor()
@@ -237,61 +251,97 @@ class PrestoConnectionPool:
             result = cursor.fetchone()
             elapsed = time.time() - start_time
             if result and result[0] == 1:
-                print(
-                    f"✅ Presto connection verified successfully in {elapsed:.2f}s!")
+                logger.info(
+                    "✅ Presto connection verified successfully in %.2fs!", elapsed)
                 return True
             else:
-                print(
-                    f"⚠️ Warning: Presto connection test returned unexpected result ({elapsed:.2f}s):", result)
+                logger.warning(
+                    "⚠️ Presto connection test returned unexpected result (%.2fs): %s", elapsed, result)
                 return False
         except Exception as e:
             # If connection fails, close connection and raise exception
             elapsed = time.time() - start_time
             cursor.close()
-            print(f"Failed to connect to Presto ({elapsed:.2f}s): {str(e)}")
+            logger.warning("Failed to connect to Presto (%.2fs): %s", elapsed, e)
             return False
         finally:
             cursor.close()
 
-    def get_connection(self) -> presto.Connection:
+    def get_connection(self) -> dbapi.Connection:
         """
         Get a connection from the pool.
 
+        Blocks for up to ``acquire_timeout`` seconds when all ``max_conn``
+        connections are checked out.
+
         Returns:
             A Presto connection object
 
         Raises:
             ValueError: If cannot get a valid connection
         """
-        with self._lock:
-            # First, try to get an existing connection from the pool
-            if self._pool:
-                conn_info = self._pool.pop()
-                conn = conn_info['conn']
-                conn_info['last_used_time'] = time.time()
-                self._in_use[id(conn)] = conn_info
-                return conn
-
-            # If no valid connection in pool, check if we can create a new one
-            if len(self._in_use) < self._max_conn:
+        if not self._sem.acquire(timeout=self._acquire_timeout):
+            raise ValueError(
+                f"Connection pool exhausted, max connections: {self._max_conn}. "
+                f"No connection was released within {self._acquire_timeout}s")
+
+        current_time = time.time()
+        try:
+            # First, try to get an existing connection from the pool. Idle
+            # connections are validated here, when they are about to be used,
+            # instead of by a background thread.
+            while True:
                 try:
-                    conn = self._create_new_connection(self.connect_kwargs)
-                    conn_info = {
-                        'conn': conn,
-                        'created_time': time.time(),
-                        'last_used_time': time.time()
-                    }
-                    self._in_use[id(conn)] = conn_info
-                    return conn
-                except Exception as e:
-                    raise ValueError(
-                        f"Failed to create new connection: {str(e)}")
+                    conn_info = self._idle.get_nowait()
+                except queue.Empty:
+                    # No idle connection, create a new one (the semaphore keeps us under max_conn)
+                    try:
+                        conn = self._create_new_connection()
+                    except Exception as e:
+                        raise ValueError(
+                            f"Failed to create new connection: {str(e)}")
+                    conn_info = self._new_conn_info(conn)
+                    break
+
+                # Drop connections that have been idle for too long
+                if current_time - conn_info['last_used_time'] > self._max_idle_time:
+                    self._drop("idle connection that exceeded max idle time")
+                    continue
 
-            # Pool exhausted
-            print(
-                f"Connection pool exhausted, max connections: {self._max_conn}. Just wait for a moment...")
+                # Trust the connection until probe_after has passed since its last probe
+                if current_time - conn_info['last_probed_time'] > self._probe_after:
+                    if not self.verify_connection(conn_info['conn']):
+                        self._drop("invalid connection")
+                        continue
+                    conn_info['last_probed_time'] = current_time
+                break
+        except BaseException:
+            self._sem.release()
+            raise
+
+        conn = conn_info['conn']
+        conn_info['last_used_time'] = current_time
+        self._in_use[id(conn)] = conn_info
+        return conn
 
-    def release_connection(self, conn: presto.Connection) -> None:
+    @contextlib.contextmanager
+    def acquire(self) -> Iterator[dbapi.Connection]:
+        """
+        Check out a connection for the duration of a ``with`` block.
+
+        Yields:
+            A Presto connection object, released back to the pool on exit
+
+        Raises:
+            ValueError: If cannot get a valid connection
+        """
+        conn = self.get_connection()
+        try:
+            yield conn
+        finally:
+            self.release_connection(conn)
+
+    def release_connection(self, conn: dbapi.Connection) -> None:
         """
         Release a connection back to the pool.
 
@@ -301,47 +351,48 @@ class PrestoConnectionPool:
         if not conn:
             return
 
-        with self._lock:
-            conn_id = id(conn)
-            if conn_id in self._in_use:
-                conn_info = self._in_use.pop(conn_id)
-                conn_info['last_used_time'] = time.time()
-                # Return to pool if we're under max capacity
-                if len(self._pool) < self._max_conn:
-                    self._pool.append(conn_info)
-                    return
-
-                # If we're at capacity or connection is invalid, close it
-                try:
-                    conn.close()
-                except Exception as e:
-                    print(f"Error closing connection: {str(e)}")
+        conn_info = self._in_use.pop(id(conn), None)
+        if conn_info is None:
+            return
 
-    def close_all(self) -> None:
-        """Close all connections in the pool."""
-        self._stop_validation = True
+        conn_info['last_used_time'] = time.time()
+        try:
+            # Return to pool if we're under max capacity
+            try:
+                self._idle.put_nowait(conn_info)
+            except queue.Full:
+                # If we're at capacity, drop it
+                self._drop("connection over pool capacity")
+        finally:
+            self._sem.release()
 
-        if self._validation_thread.is_alive():
-            self._validation_thread.join(timeout=1.0)
+        # Replace connections dropped at checkout if we fell below min_conn
+        if self._idle.qsize() + len(self._in_use) < self._min_conn:
+            self._top_up()
 
+    def close_all(self) -> None:
+        """Close all connections in the pool."""
         with self._lock:
-            # Close in-use connections
-            for conn_info in self._in_use.values():
+            # Close in-use connections; workers may release them concurrently, so iterate a copy
+            for conn_info in list(self._in_use.values()):
                 try:
                     conn_info['conn'].close()
                 except Exception as e:
-                    print(f"Error closing in-use connection: {str(e)}")
+                    logger.warning("Error closing in-use connection: %s", e)
 
             # Close pooled connections
-            for conn_info in self._pool:
+            while True:
+                try:
+                    conn_info = self._idle.get_nowait()
+                except queue.Empty:
+                    break
                 try:
                     conn_info['conn'].close()
                 except Exception as e:
-                    print(f"Error closing pooled connection: {str(e)}")
+                    logger.warning("Error closing pooled connection: %s", e)
 
             # Clear the collections
             self._in_use.clear()
-            self._pool.clear()
 
     def __del__(self):
         """Destructor to ensure connections are closed."""
@@ -356,23 +407,29 @@ _pool_instance: Optional[PrestoConnectionPool] = None
 _pool_lock = threading.Lock()
 
 
-def get_connection_pool(min_conn: int = 2, max_conn: int = 10) -> PrestoConnectionPool:
+@functools.cache
+def get_connection_pool(min_conn: Optional[int] = None,
+                        max_conn: Optional[int] = None) -> PrestoConnectionPool:
     """
     Get the global connection pool instance.
 
+    The result is memoized, so after the first call the pool is returned
+    without taking a lock; the lock only serializes the one-time construction.
+
     Args:
-        min_conn: Minimum number of connections to keep
-        max_conn: Maximum number of connections allowed
+        min_conn: Minimum number of connections to keep (default: --min-connections)
+        max_conn: Maximum number of connections allowed (default: --max-connections)
 
     Returns:
         The connection pool instance
     """
     global _pool_instance
 
-    if _pool_instance is None:
-        with _pool_lock:
-            if _pool_instance is None:
-                _pool_instance = PrestoConnectionPool(
-                    min_conn=min_conn, max_conn=max_conn)
+    with _pool_lock:
+        if _pool_instance is None:
+            settings = get_settings()
+            _pool_instance = PrestoConnectionPool(
+                min_conn=settings.MIN_CONNECTIONS if min_conn is None else min_conn,
+                max_conn=settings.MAX_CONNECTIONS if max_conn is None else max_conn)
 
     return _pool_instance
@@ -0,0 +1,108 @@
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Tuple
+
+# Marks a cache miss (cached values may legitimately be None)
+_MISSING = object()
+
+
+class MetadataCache:
+    """
+    A small in-process TTL cache for metadata query results.
+
+    Table lists and table descriptions change rarely, so repeated MCP calls
+    can be answered from memory instead of running a Presto query each time.
+    Entries expire ``ttl`` seconds after they are stored, and the least
+    recently used entry is evicted once ``maxsize`` is exceeded. Concurrent
+    misses for the same key share a single load.
+
+    The cache is not thread-safe; use it from the event loop thread only.
+    """
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 60):
+        """
+        Initialize the cache.
+
+        Args:
+            maxsize: Maximum number of entries to keep
+            ttl: Time in seconds an entry stays valid
+        """
+        # key -> (expiry_time, value), least recently used first
+        self._entries: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+        # key -> load currently in flight
+        self._pending: Dict[Hashable, "asyncio.Future[Any]"] = {}
+        self._maxsize: int = maxsize
+        self._ttl: float = ttl
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """Return the cached value for key, or default if it is missing or expired."""
+        entry = self._entries.get(key)
+        if entry is None:
+            return default
+        if entry[0] <= time.monotonic():
+            del self._entries[key]
+            return default
+        self._entries.move_to_end(key)
+        return entry[1]
+
+    def set(self, key: Hashable, value: Any) -> None:
+        """Store a value for key."""
+        self._entries[key] = (time.monotonic() + self._ttl, value)
+        self._entries.move_to_end(key)
+        if len(self._entries) > self._maxsize:
+            self._entries.popitem(last=False)
+
+    def clear(self, predicate: Optional[Callable[[Hashable], bool]] = None) -> int:
+        """
+        Drop all entries, or only those whose key matches predicate.
+
+        Loads already in flight still store their result when they finish.
+
+        Args:
+            predicate: Called with each key; entries it returns True for are dropped
+
+        Returns:
+            Number of entries dropped
+        """
+        if predicate is None:
+            dropped = len(self._entries)
+            self._entries.clear()
+            return dropped
+
+        keys = [key for key in self._entries if predicate(key)]
+        for key in keys:
+            del self._entries[key]
+        return len(keys)
+
+    async def get_or_load(self, key: Hashable, loader: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Return the cached value for key, loading and storing it on a miss.
+
+        Callers that miss while a load for the same key is already running wait
+        for that load instead of starting their own.
+
+        Args:
+            key: Cache key
+            loader: Coroutine function producing the value
+
+        Returns:
+            The cached or freshly loaded value
+        """
+        value = self.get(key, _MISSING)
+        if value is not _MISSING:
+            return value
+
+        pending = self._pending.get(key)
+        if pending is not None:
+            return await asyncio.shield(pending)
+
+        task = asyncio.ensure_future(loader())
+        self._pending[key] = task
+        try:
+            value = await asyncio.shield(task)
+        finally:
+            self._pending.pop(key, None)
+
+        self.set(key, value)
+        return value
@@ -1,11 +1,59 @@
-import pandas as pd
-from typing import List, Dict, Any, Tuple, Optional
-import app.config.settings as settings
+from typing import TYPE_CHECKING, List, Dict, Any, Sequence, Tuple, Optional
+from app.config.settings import get_settings
+import logging
+import re
+import threading
 import time
+import uuid
+from collections import OrderedDict
 from app.services.connection_pool import get_connection_pool
 
+if TYPE_CHECKING:
+    import pandas as pd
+    import pyarrow as pa
+
+logger = logging.getLogger(__name__)
+
+# Number of rows pulled from the cursor per fetchmany() call
+FETCH_BATCH_SIZE = 10000
+
+# Seconds a streamed result stays open without a fetch before it is closed
+STREAM_TTL = 300
+# Maximum number of streamed results open at once; each holds a pooled connection,
+# so the limit is lowered to leave at least one connection for other queries
+MAX_STREAMS = 4
+
+# All columns of all tables in a schema, for PrestoService.describe_schema. The
+# column aliases match what DESCRIBE returns (Trino derives DESCRIBE from this view).
+# Filled with "<catalog>." for a catalog-qualified schema, or "" for the session catalog.
+DESCRIBE_SCHEMA_QUERY = (
+    "SELECT table_name, column_name AS \"Column\", data_type AS \"Type\", "
+    "COALESCE(extra_info, '') AS \"Extra\", COALESCE(comment, '') AS \"Comment\" "
+    "FROM {}information_schema.columns "
+    "WHERE table_schema = ? "
+    "ORDER BY table_name, ordinal_position"
+).format
+
+# Queries that a LIMIT clause can be appended to, to push a row limit down to Trino
+_ROW_QUERY_RE = re.compile(r'^\s*\(?\s*(?:select|with|values|table)\b', re.IGNORECASE)
+# A LIMIT / FETCH FIRST that ends the query, i.e. applies to the whole result.
+# A LIMIT inside a subquery does not count; appending one to such a query is still safe.
+_HAS_LIMIT_RE = re.compile(
+    r'\b(?:limit\s+(?:\d+|all)|fetch\s+(?:first|next)\s+(?:\d+\s+)?rows?\s+(?:only|with\s+ties))$',
+    re.IGNORECASE)
+# SQL tokens; "skip" matches comments, whitespace and semicolons. Quoted literals and
+# identifiers are matched whole so "--" or "/*" inside them is not taken for a comment.
+_SQL_TOKEN_RE = re.compile(
+    r"(?P<skip>--[^\n]*|/\*.*?(?:\*/|\Z)|[\s;]+)"
+    r"|'(?:[^']|'')*'?|\"(?:[^\"]|\"\")*\"?|[^\s;'\"/-]+|.",
+    re.DOTALL)
+
 
 class PrestoService:
+    # stream token -> {"conn", "cursor", "columns", "expiry"}, oldest first
+    _streams: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+    _streams_lock = threading.Lock()
+
     @staticmethod
     def get_connection():
         """Get a connection from the connection pool."""
@@ -17,126 +65,430 @@ class PrestoService:
         get_connection_pool().release_connection(conn)
 
     @staticmethod
-    def execute_query(query: str, params: Optional[Dict[str, Any]] = None, limit: Optional[int] = None) -> Tuple[List[str], List[List[Any]], int]:
+    def _strip_trailing(query: str) -> str:
+        """Return the query up to its last token, without trailing comments, whitespace or semicolons."""
+        end = 0
+        for match in _SQL_TOKEN_RE.finditer(query):
+            if match.lastgroup != "skip":
+                end = match.end()
+        return query[:end]
+
+    @staticmethod
+    def _apply_limit(query: str, limit: Optional[int]) -> str:
+        """
+        Push a row limit down into the SQL so Trino stops producing rows early.
+
+        Only row-returning queries (SELECT/WITH/VALUES/TABLE) without a top-level
+        LIMIT of their own are rewritten; everything else is returned unchanged.
+        The LIMIT is appended rather than wrapping the query in a subquery, since
+        Trino drops an ORDER BY in a subquery. Trailing comments are ignored when
+        looking for an existing LIMIT and dropped before appending one:
+
+            SELECT * FROM t ORDER BY x           -> SELECT * FROM t ORDER BY x\nLIMIT n
+            SELECT a FROM t LIMIT 10 /* note */  -> unchanged
+            SELECT 1 -- limit 5                  -> SELECT 1\nLIMIT n
+
+        Args:
+            query: SQL query to execute
+            limit: Max number of rows to return
+
+        Returns:
+            The query to send to Trino
+
+        Raises:
+            ValueError: If limit is not a positive integer
+        """
+        if not limit:
+            return query
+        if not isinstance(limit, int) or isinstance(limit, bool) or limit < 0:
+            raise ValueError(f"limit must be a positive integer, got {limit!r}")
+
+        if not _ROW_QUERY_RE.match(query):
+            return query
+        body = PrestoService._strip_trailing(query)
+        if _HAS_LIMIT_RE.search(body):
+            return query
+
+        return f"{body}\nLIMIT {limit}"
+
+    @staticmethod
+    def execute_query(query: str, params: Optional[Sequence[Any]] = None, limit: Optional[int] = None) -> Tuple[List[str], List[Sequence[Any]], int]:
         """
         Execute a query and return results.
         
         Args:
             query: SQL query to execute
-            params: Query parameters (for parameterized queries)
+            params: Query parameters for ? placeholders
             limit: Max number of rows to return
             
         Returns:
             Tuple of (column_names, data, row_count)
         """
-        conn = PrestoService.get_connection()
-        cursor = conn.cursor()
-        
-        try:
-            # Set query timeout
-            if settings.QUERY_TIMEOUT:
-                try:
-                    cursor.execute(f"SET SESSION query_max_execution_time = '{settings.QUERY_TIMEOUT}s'")
-                except Exception as e:
-                    print(f"⚠️ Warning: Failed to set query timeout: {str(e)}")
+        settings = get_settings()
+        query = PrestoService._apply_limit(query, limit)
+        with get_connection_pool().acquire() as conn:
+            cursor = conn.cursor()
+            cursor.arraysize = FETCH_BATCH_SIZE
+            try:
+                if logger.isEnabledFor(logging.INFO):
+                    logger.info("Executing query with %ss timeout: %s%s", settings.QUERY_TIMEOUT,
+                                query[:200], '...' if len(query) > 200 else '')
+                start_time = time.time()
             
-            print(f"Executing query with {settings.QUERY_TIMEOUT}s timeout: {query[:200]}{'...' if len(query) > 200 else ''}")
-            start_time = time.time()
+                # Execute the query with parameters if provided (trino binds
+                # them to ? placeholders server-side)
+                cursor.execute(query, params or None)
             
-            # Execute the query with parameters if provided
-            if params:
-                # PyHive doesn't directly support parameterized queries,
-                # but we could implement parameter substitution here if needed
-                pass
+                # Get column names (if query returned results)
+                description = cursor.description
+                if description:
+                    columns = [desc[0] for desc in description]
                 
-            cursor.execute(query)
-            
-            # Get column names (if query returned results)
-            if cursor.description:
-                columns = [desc[0] for desc in cursor.description]
+                    # Fetch results with optional limit (kept as a safety net for
+                    # queries that could not be rewritten)
+                    if limit:
+                        results = cursor.fetchmany(limit)
+                    else:
+                        # Drain in batches of cursor.arraysize rows
+                        results = []
+                        while True:
+                            chunk = cursor.fetchmany()
+                            if not chunk:
+                                break
+                            results.extend(chunk)
                 
-                # Fetch results with optional limit
-                if limit:
-                    results = cursor.fetchmany(limit)
-                else:
-                    results = cursor.fetchall()
+                    # Rows are returned as the driver produced them (lists or
+                    # tuples); both serialize to JSON arrays without a copy
+                    data = results
+                    row_count = len(data)
                 
-                # Convert to list for JSON serializability
-                data = [list(row) for row in results]
-                row_count = len(data)
+                    elapsed = time.time() - start_time
+                    logger.info("Query completed in %.2fs, returned %d rows", elapsed, row_count)
                 
-                elapsed = time.time() - start_time
-                print(f"Query completed in {elapsed:.2f}s, returned {row_count} rows")
-                
-                return columns, data, row_count
-            else:
-                # For queries that don't return results (e.g., INSERT, UPDATE)
-                elapsed = time.time() - start_time
-                print(f"Query completed in {elapsed:.2f}s, no results returned")
-                return [], [], 0
-        finally:
-            cursor.close()
-            PrestoService.release_connection(conn)
+                    return columns, data, row_count
+                else:
+                    # For queries that don't return results (e.g., INSERT, UPDATE)
+                    elapsed = time.time() - start_time
+                    logger.info("Query completed in %.2fs, no results returned", elapsed)
+                    return [], [], 0
+            finally:
+                cursor.close()
     
     @staticmethod
-    def execute_query_to_df(query: str, params: Optional[Dict[str, Any]] = None) -> pd.DataFrame:
+    def _close_stream(stream: Dict[str, Any]) -> None:
+        """Close a streamed result's cursor and return its connection to the pool."""
+        try:
+            stream["cursor"].close()
+        except Exception as e:
+            logger.warning("Error closing stream cursor: %s", e)
+        finally:
+            get_connection_pool().release_connection(stream["conn"])
+
+    @staticmethod
+    def _max_streams() -> int:
+        """Number of streams that may stay open without holding every pooled connection."""
+        return min(MAX_STREAMS, get_connection_pool().max_conn - 1)
+
+    @staticmethod
+    def _evict_streams(keep: int) -> None:
+        """Close expired streams, then the oldest ones until at most keep remain open."""
+        now = time.monotonic()
+        evicted = []
+        with PrestoService._streams_lock:
+            streams = PrestoService._streams
+            for token in [t for t, stream in streams.items() if stream["expiry"] <= now]:
+                evicted.append(streams.pop(token))
+            while len(streams) > keep:
+                evicted.append(streams.popitem(last=False)[1])
+        for stream in evicted:
+            PrestoService._close_stream(stream)
+
+    @staticmethod
+    def _next_page(token: str, stream: Dict[str, Any], page_size: int) -> Tuple[List[Sequence[Any]], Optional[str]]:
+        """
+        Fetch the next page of a stream, keeping it open only if more rows may follow.
+
+        Returns:
+            Tuple of (data, next_token); next_token is None once the result is exhausted
+        """
+        try:
+            data = stream["cursor"].fetchmany(page_size)
+        except BaseException:
+            PrestoService._close_stream(stream)
+            raise
+
+        if len(data) < page_size:
+            PrestoService._close_stream(stream)
+            logger.info("Stream %s finished", token)
+            return data, None
+
+        stream["expiry"] = time.monotonic() + STREAM_TTL
+        with PrestoService._streams_lock:
+            PrestoService._streams[token] = stream
+        return data, token
+
+    @staticmethod
+    def start_stream(query: str, page_size: int, params: Optional[Sequence[Any]] = None,
+                     limit: Optional[int] = None) -> Tuple[List[str], List[Sequence[Any]], Optional[str]]:
+        """
+        Execute a query and return its first page of rows, keeping the cursor open
+        so fetch_stream() can return the rest page by page.
+
+        The open cursor holds a pooled connection until the result is exhausted
+        or it goes unfetched for STREAM_TTL seconds.
+
+        Args:
+            query: SQL query to execute
+            page_size: Number of rows per page
+            params: Query parameters for ? placeholders
+            limit: Max number of rows to return in total
+
+        Returns:
+            Tuple of (column_names, data, next_token); next_token is None when
+            the first page already holds every row
+
+        Raises:
+            ValueError: If page_size is invalid or the pool is too small to stream
+        """
+        if not isinstance(page_size, int) or isinstance(page_size, bool) or page_size <= 0:
+            raise ValueError(f"page_size must be a positive integer, got {page_size!r}")
+
+        max_streams = PrestoService._max_streams()
+        if max_streams < 1:
+            raise ValueError("Streaming needs --max-connections of at least 2")
+
+        # Make room for the new stream first
+        PrestoService._evict_streams(max_streams - 1)
+
+        settings = get_settings()
+        query = PrestoService._apply_limit(query, limit)
+        pool = get_connection_pool()
+        conn = pool.get_connection()
+        try:
+            cursor = conn.cursor()
+            cursor.arraysize = FETCH_BATCH_SIZE
+        except BaseException:
+            pool.release_connection(conn)
+            raise
+        stream = {"conn": conn, "cursor": cursor}
+
+        try:
+            if logger.isEnabledFor(logging.INFO):
+                logger.info("Streaming query with %ss timeout: %s%s", settings.QUERY_TIMEOUT,
+                            query[:200], '...' if len(query) > 200 else '')
+            cursor.execute(query, params or None)
+            description = cursor.description
+        except BaseException:
+            PrestoService._close_stream(stream)
+            raise
+
+        if not description:
+            # Nothing to stream (e.g., INSERT, UPDATE)
+            PrestoService._close_stream(stream)
+            return [], [], None
+
+        stream["columns"] = [desc[0] for desc in description]
+        data, token = PrestoService._next_page(uuid.uuid4().hex, stream, page_size)
+        return stream["columns"], data, token
+
+    @staticmethod
+    def fetch_stream(token: str, page_size: int) -> Tuple[List[str], List[Sequence[Any]], Optional[str]]:
+        """
+        Return the next page of a result opened by start_stream().
+
+        Args:
+            token: next_token returned by the previous page
+            page_size: Number of rows per page
+
+        Returns:
+            Tuple of (column_names, data, next_token); next_token is None once
+            the result is exhausted
+
+        Raises:
+            ValueError: If the token is unknown, already consumed or expired
+        """
+        if not isinstance(page_size, int) or isinstance(page_size, bool) or page_size <= 0:
+            raise ValueError(f"page_size must be a positive integer, got {page_size!r}")
+
+        PrestoService._evict_streams(PrestoService._max_streams())
+
+        # Taken out of the registry while fetching so concurrent calls cannot share the cursor
+        with PrestoService._streams_lock:
+            stream = PrestoService._streams.pop(token, None)
+        if stream is None:
+            raise ValueError(f"Unknown or expired stream token: {token!r}")
+
+        data, token = PrestoService._next_page(token, stream, page_size)
+        return stream["columns"], data, token
+
+    @staticmethod
+    def execute_query_to_df(query: str, params: Optional[Sequence[Any]] = None) -> "pd.DataFrame":
         """
         Execute a query and return results as a pandas DataFrame.
         
         Args:
             query: SQL query to execute
-            params: Query parameters (for parameterized queries)
+            params: Query parameters for ? placeholders
             
         Returns:
             pandas DataFrame with query results
         """
-        conn = PrestoService.get_connection()
-        cursor = conn.cursor()
+        # Imported lazily: pandas is slow to import and only this method needs it
+        import pandas as pd
         
-        try:
-            # Set query timeout
-            if settings.QUERY_TIMEOUT:
-                try:
-                    cursor.execute(f"SET SESSION query_max_execution_time = '{settings.QUERY_TIMEOUT}s'")
-                except Exception as e:
-                    print(f"⚠️ Warning: Failed to set query timeout: {str(e)}")
+        settings = get_settings()
+        with get_connection_pool().acquire() as conn:
+            cursor = conn.cursor()
+            cursor.arraysize = FETCH_BATCH_SIZE
+            try:
+                if logger.isEnabledFor(logging.INFO):
+                    logger.info("Executing query with %ss timeout: %s%s", settings.QUERY_TIMEOUT,
+                                query[:200], '...' if len(query) > 200 else '')
+                start_time = time.time()
             
-            print(f"Executing query with {settings.QUERY_TIMEOUT}s timeout: {query[:200]}{'...' if len(query) > 200 else ''}")
-            start_time = time.time()
+                # Execute the query with parameters if provided (trino binds
+                # them to ? placeholders server-side)
+                cursor.execute(query, params or None)
             
-            # Execute the query with parameters if provided
-            if params:
-                # PyHive doesn't directly support parameterized queries,
-                # but we could implement parameter substitution here if needed
-                pass
+                # Get column names
+                description = cursor.description
+                if description:
+                    columns = [desc[0] for desc in description]
                 
-            cursor.execute(query)
-            
-            # Get column names
-            if cursor.description:
-                columns = [desc[0] for desc in cursor.description]
-                
-                # Fetch results
-                results = cursor.fetchall()
+                    # Fetch results in batches and transpose each batch into
+                    # per-column lists, so no list of row tuples is kept around
+                    column_values = [[] for _ in columns]
+                    while True:
+                        chunk = cursor.fetchmany()
+                        if not chunk:
+                            break
+                        for values, chunk_values in zip(column_values, zip(*chunk)):
+                            values.extend(chunk_values)
                 
-                # Create DataFrame
-                df = pd.DataFrame(results, columns=columns)
+                    # Create DataFrame column by column (positional keys keep duplicate column names)
+                    df = pd.DataFrame(dict(enumerate(column_values)), copy=False)
+                    df.columns = columns
                 
-                elapsed = time.time() - start_time
-                print(f"Query completed in {elapsed:.2f}s, returned {len(df)} rows")
+                    elapsed = time.time() - start_time
+                    logger.info("Query completed in %.2fs, returned %d rows", elapsed, len(df))
                 
-                return df
-            else:
-                # For queries that don't return results
+                    return df
+                else:
+                    # For queries that don't return results
+                    elapsed = time.time() - start_time
+                    logger.info("Query completed in %.2fs, no results returned", elapsed)
+                    return pd.DataFrame()
+            finally:
+                cursor.close()
+
+
+    @staticmethod
+    def execute_query_to_arrow(query: str, params: Optional[Sequence[Any]] = None,
+                               limit: Optional[int] = None) -> "pa.Table":
+        """
+        Execute a query and return results as a pyarrow Table.
+
+        Rows are transposed into per-column lists as they are fetched and each
+        column is converted to an Arrow array once, so no row objects are kept.
+
+        Args:
+            query: SQL query to execute
+            params: Query parameters for ? placeholders
+            limit: Max number of rows to return
+
+        Returns:
+            pyarrow Table with query results
+
+        Raises:
+            ValueError: If pyarrow is not installed
+        """
+        # Imported lazily: pyarrow is an optional dependency
+        try:
+            import pyarrow as pa
+        except ImportError:
+            raise ValueError(
+                "Arrow output requires pyarrow; install it with: pip install 'mcp-trino-python[arrow]'")
+
+        settings = get_settings()
+        query = PrestoService._apply_limit(query, limit)
+        with get_connection_pool().acquire() as conn:
+            cursor = conn.cursor()
+            cursor.arraysize = FETCH_BATCH_SIZE
+            try:
+                if logger.isEnabledFor(logging.INFO):
+                    logger.info("Executing query with %ss timeout: %s%s", settings.QUERY_TIMEOUT,
+                                query[:200], '...' if len(query) > 200 else '')
+                start_time = time.time()
+
+                cursor.execute(query, params or None)
+
+                description = cursor.description
+                if not description:
+                    elapsed = time.time() - start_time
+                    logger.info("Query completed in %.2fs, no results returned", elapsed)
+                    return pa.table({})
+
+                columns = [desc[0] for desc in description]
+
+                # Fetch in batches (at most limit rows) into per-column lists
+                column_values = [[] for _ in columns]
+                remaining = limit
+                while remaining is None or remaining > 0:
+                    size = FETCH_BATCH_SIZE if remaining is None else min(remaining, FETCH_BATCH_SIZE)
+                    chunk = cursor.fetchmany(size)
+                    if not chunk:
+                        break
+                    for values, chunk_values in zip(column_values, zip(*chunk)):
+                        values.extend(chunk_values)
+                    if remaining is not None:
+                        remaining -= len(chunk)
+
+                # from_arrays keeps duplicate column names
+                table = pa.Table.from_arrays([pa.array(values) for values in column_values], names=columns)
+
                 elapsed = time.time() - start_time
-                print(f"Query completed in {elapsed:.2f}s, no results returned")
-                return pd.DataFrame()
-        finally:
-            cursor.close()
-            PrestoService.release_connection(conn)
+                logger.info("Query completed in %.2fs, returned %d rows", elapsed, table.num_rows)
 
+                return table
+            finally:
+                cursor.close()
+
+    @staticmethod
+    def describe_schema(schema: str) -> Dict[str, List[Dict[str, Any]]]:
+        """
+        Describe every table in a schema with a single information_schema query.
+
+        Args:
+            schema: Schema to describe, optionally qualified as catalog.schema; the
+                catalog is interpolated, so it must already be a validated identifier
+
+        Returns:
+            Mapping of table name to its columns (as DESCRIBE records), in ordinal order
+        """
+        catalog, _, name = schema.rpartition('.')
+        columns, data, _ = PrestoService.execute_query(
+            query=DESCRIBE_SCHEMA_QUERY(f"{catalog}." if catalog else ""), params=[name])
+
+        column_keys = columns[1:]
+        tables: Dict[str, List[Dict[str, Any]]] = {}
+        for row in data:
+            tables.setdefault(row[0], []).append(dict(zip(column_keys, row[1:])))
+        return tables
+
+    @staticmethod
+    def ping() -> bool:
+        """
+        Run SELECT 1 on a pooled connection.
+
+        Returns:
+            True if Presto answered as expected
+        """
+        pool = get_connection_pool()
+        with pool.acquire() as conn:
+            return pool.verify_connection(conn)
 
     @staticmethod
     def close_all():
-        """Close all connections in the connection pool."""
+        """Close open streams and all connections in the connection pool."""
+        PrestoService._evict_streams(0)
         get_connection_pool().close_all()
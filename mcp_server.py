@@ -1,196 +1,632 @@
 #!/usr/bin/env python3
 
 import asyncio
+import base64
+import functools
 import json
-import time
-import pandas as pd
+import logging
+import os
+import re
 import traceback
+from concurrent.futures import ThreadPoolExecutor
+from io import TextIOWrapper
 import signal
 import sys
 from typing import Any, Dict, List, Optional
 
+import anyio
 import mcp.types as types
+import pydantic_core
 from mcp.server import FastMCP
+from mcp.server.stdio import stdio_server
+from mcp.server.fastmcp.resources import TextResource
 
+from app.services.connection_pool import check_host_connectivity, get_connection_pool
+from app.services.metadata_cache import MetadataCache
 from app.services.presto_service import PrestoService
-from app.config.settings import PRESTO_HOST, PRESTO_PORT, PRESTO_SCHEMA, print_config
+from app.config.settings import get_settings, print_config
 
-# Create MCP server
+logger = logging.getLogger(__name__)
+
+# Create MCP server; tools and resources are added by register() from main()
 app = FastMCP("mcp-trino-python")
 
-# Register Trino resource
-@app.resource(
-    uri=f"trino://{PRESTO_HOST}:{PRESTO_PORT}/{PRESTO_SCHEMA}",
-    name=f"Trino Database ({PRESTO_SCHEMA})",
-    description="Trino SQL database connection"
-)
-def trino_resource():
+# Plain SQL identifiers; schemas may be qualified with a catalog. Identifiers cannot
+# be bound as query parameters, so only names matching these are interpolated.
+_IDENT = re.compile(r"[A-Za-z_][A-Za-z0-9_]*").fullmatch
+_SCHEMA_IDENT = re.compile(r"[A-Za-z_][A-Za-z0-9_]*(?:\.[A-Za-z_][A-Za-z0-9_]*)?").fullmatch
+
+# Metadata query templates, filled with validated identifiers
+_SHOW_TABLES_QUERY = "SHOW TABLES FROM {}".format
+_DESCRIBE_QUERY = "DESCRIBE {}.{}".format
+
+# Caches for table lists and descriptions, which rarely change during a session.
+# Table lists change more often (tables are created and dropped) than table
+# structures, so they expire sooner. Keys start with the tool name and schema.
+_tables_cache = MetadataCache(maxsize=64, ttl=60)
+_describe_cache = MetadataCache(maxsize=1024, ttl=300)
+
+# Innermost traceback frames included in MCP_DEBUG error responses
+TRACEBACK_LIMIT = 5
+
+@functools.cache
+def _executor() -> ThreadPoolExecutor:
+    """Worker threads for blocking Presto calls, one per pooled connection."""
+    return ThreadPoolExecutor(
+        max_workers=get_connection_pool().max_conn, thread_name_prefix="presto")
+
+async def _run_blocking(func, *args, **kwargs):
+    """
+    Run a blocking PrestoService call in a worker thread so the event loop keeps
+    serving other calls. Sizing the executor to the connection pool means calls
+    beyond max_conn queue here instead of holding threads blocked on the pool.
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_executor(), functools.partial(func, *args, **kwargs))
+
+def _pack(obj: Any) -> List[types.TextContent]:
+    """Serialize a tool response to compact JSON text content."""
+    return [types.TextContent(type="text", text=pydantic_core.to_json(obj, fallback=str).decode())]
+
+def _fmt_err(e: BaseException) -> str:
+    """Format the innermost frames of an exception's traceback, without locals."""
+    return "".join(traceback.TracebackException.from_exception(
+        e, limit=-TRACEBACK_LIMIT, capture_locals=False).format())
+
+def _tool_handler(handler):
+    """
+    Wrap a tool handler so its response is returned as pre-serialized JSON and
+    any exception becomes an error response. A traceback capped at
+    TRACEBACK_LIMIT frames is only included with MCP_DEBUG=1; otherwise just the
+    exception line is.
+    """
+    @functools.wraps(handler)
+    async def wrapper(params: Dict[str, Any]) -> List[types.TextContent]:
+        try:
+            result = await handler(params)
+        except Exception as e:
+            if get_settings().DEBUG:
+                tb = _fmt_err(e)
+            else:
+                tb = "".join(traceback.format_exception_only(type(e), e))
+            result = {
+                "error": str(e),
+                "traceback": tb
+            }
+        return _pack(result)
+    return wrapper
+
+def _query_to_arrow_ipc(query: str, limit: Optional[int]) -> Dict[str, Any]:
+    """Run a query and encode its result as a base64 Arrow IPC stream."""
+    table = PrestoService.execute_query_to_arrow(query=query, limit=limit)
+    
+    # pyarrow is optional; execute_query_to_arrow has already checked it is installed
+    import pyarrow as pa
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    
     return {
-        "host": PRESTO_HOST,
-        "port": PRESTO_PORT,
-        "schema": PRESTO_SCHEMA
+        "columns": table.column_names,
+        "format": "arrow",
+        "data": base64.b64encode(sink.getvalue()).decode("ascii"),
+        "row_count": table.num_rows
     }
 
+def _positive_int(value: Any, name: str) -> Optional[int]:
+    """
+    Parse an optional positive integer parameter. Clients may send numbers as
+    strings ("500") or integral floats (500.0); anything else is rejected.
+
+    Raises:
+        ValueError: If value is not None and not a positive integer
+    """
+    if value is None:
+        return None
+    parsed = value
+    if isinstance(value, float) and value.is_integer():
+        parsed = int(value)
+    elif isinstance(value, str) and value.strip().isascii() and value.strip().isdigit():
+        parsed = int(value)
+    if not isinstance(parsed, int) or isinstance(parsed, bool) or parsed <= 0:
+        raise ValueError(f"{name} must be a positive integer, got {value!r}")
+    return parsed
+
 # Define a query command
-@app.tool(
-    name="execute-query",
-    description="Execute SQL Query",
-    annotations=types.ToolAnnotations(
-        title="Execute SQL Query",
-        readOnlyHint=True
-    )
-)
 async def execute_query(
     params: Dict[str, Any]
 ) -> Dict[str, Any]:
     """Execute SQL query and return results"""
+    query = params.get("query")
+    stream = params.get("stream", False)
+    # Default value is 2000; streamed results are paged instead of capped
+    limit = params.get("limit", None if stream else 2000)
+    
+    if not query:
+        return {
+            "error": "Query is required"
+        }
+    
+    # The limit is pushed into the SQL as LIMIT n
     try:
-        query = params.get("query")
-        limit = params.get("limit", 2000)  # Default value is 2000
-        
-        if not query:
+        limit = _positive_int(limit, "limit")
+        page_size = _positive_int(params.get("page_size", 1000), "page_size")
+    except ValueError as e:
+        return {
+            "error": str(e)
+        }
+    
+    result_format = params.get("format", "json")
+    if result_format not in ("json", "arrow"):
+        return {
+            "error": f"Unsupported format: {result_format!r} (expected 'json' or 'arrow')"
+        }
+    
+    if result_format == "arrow":
+        if stream:
             return {
-                "error": "Query is required"
+                "error": "format 'arrow' cannot be combined with stream"
             }
-        
-        # Execute query
-        columns, data, row_count = PrestoService.execute_query(
+        # Columnar result, serialized in a worker thread
+        return await _run_blocking(_query_to_arrow_ipc, query, limit)
+    
+    if stream:
+        # Return the first page and a token for fetch-next
+        columns, data, next_token = await _run_blocking(
+            PrestoService.start_stream,
             query=query,
+            page_size=page_size,
             limit=limit
         )
         
         return {
             "columns": columns,
             "data": data,
-            "row_count": row_count
+            "row_count": len(data),
+            "next_token": next_token
         }
-    except Exception as e:
+    
+    # Execute query (in a worker thread so the event loop keeps serving other calls)
+    columns, data, row_count = await _run_blocking(
+        PrestoService.execute_query,
+        query=query,
+        limit=limit
+    )
+    
+    return {
+        "columns": columns,
+        "data": data,
+        "row_count": row_count
+    }
+
+# Fetch the next page of a streamed query
+async def fetch_next(
+    params: Dict[str, Any]
+) -> Dict[str, Any]:
+    """Return the next page of a query started with execute-query stream=true"""
+    token = params.get("next_token")
+    
+    if not token:
+        return {
+            "error": "next_token is required"
+        }
+    
+    try:
+        page_size = _positive_int(params.get("page_size", 1000), "page_size")
+    except ValueError as e:
         return {
-            "error": str(e),
-            "traceback": traceback.format_exc()
+            "error": str(e)
         }
+    
+    columns, data, next_token = await _run_blocking(
+        PrestoService.fetch_stream,
+        token=token,
+        page_size=page_size
+    )
+    
+    return {
+        "columns": columns,
+        "data": data,
+        "row_count": len(data),
+        "next_token": next_token
+    }
 
 # Get table list
-@app.tool(
-    name="list-tables",
-    description="List Database Tables",
-    annotations=types.ToolAnnotations(
-        title="List Database Tables",
-        readOnlyHint=True
-    )
-)
 async def list_tables(
     params: Dict[str, Any]
 ) -> Dict[str, Any]:
     """List tables in the database"""
-    try:
-        schema = params.get("schema", PRESTO_SCHEMA)
-        
+    schema = params.get("schema", get_settings().PRESTO_SCHEMA)
+    
+    # Only plain names are interpolated into the metadata queries
+    if not _SCHEMA_IDENT(schema):
+        return {
+            "error": f"Invalid schema name: {schema!r}"
+        }
+    
+    # Repeated calls for the same schema share one string for the cache key and query
+    schema = sys.intern(schema)
+    
+    async def load_tables() -> Dict[str, Any]:
         # Query table list
-        query = f"SHOW TABLES FROM {schema}"
+        query = _SHOW_TABLES_QUERY(schema)
         
-        # Execute query
-        df = PrestoService.execute_query_to_df(query=query)
+        # Execute query (in a worker thread so the event loop keeps serving other calls)
+        _, data, _ = await _run_blocking(PrestoService.execute_query, query=query)
         
-        # Convert to list
-        tables = df.values.tolist() if not df.empty else []
+        # SHOW TABLES has a single column: the table name
+        tables = [row[0] for row in data]
         
         return {
             "tables": tables,
             "schema": schema
         }
-    except Exception as e:
+    
+    # Serve repeated calls from the metadata cache
+    return await _tables_cache.get_or_load(("list-tables", schema), load_tables)
+
+async def _describe(schema: str, table: str) -> Dict[str, Any]:
+    """Describe one (already validated) table, answering from the metadata cache when possible."""
+    # Repeated calls for the same table share one string for the cache keys and query
+    schema, table = sys.intern(schema), sys.intern(table)
+    
+    # A cached describe-schema result for the schema already has this table
+    schema_tables = _describe_cache.get(("describe-schema", schema))
+    if schema_tables is not None and table in schema_tables["tables"]:
         return {
-            "error": str(e),
-            "traceback": traceback.format_exc()
+            "columns": schema_tables["tables"][table],
+            "table": table,
+            "schema": schema
         }
-
-# Get table structure
-@app.tool(
-    name="describe-table",
-    description="Describe Table Structure",
-    annotations=types.ToolAnnotations(
-        title="Describe Table Structure",
-        readOnlyHint=True
-    )
-)
-async def describe_table(
-    params: Dict[str, Any]
-) -> Dict[str, Any]:
-    """Get table structure"""
-    try:
-        schema = params.get("schema", PRESTO_SCHEMA)
-        table = params.get("table")
-        
-        if not table:
-            return {
-                "error": "Table name is required"
-            }
-        
+    
+    async def load_description() -> Dict[str, Any]:
         # Query table structure
-        query = f"DESCRIBE {schema}.{table}"
+        query = _DESCRIBE_QUERY(schema, table)
         
-        # Execute query
-        df = PrestoService.execute_query_to_df(query=query)
+        # Execute query (in a worker thread so the event loop keeps serving other calls)
+        keys, data, _ = await _run_blocking(PrestoService.execute_query, query=query)
         
         # Convert to dictionary list
-        columns = []
-        if not df.empty:
-            columns = df.to_dict(orient="records")
+        columns = [dict(zip(keys, row)) for row in data]
         
         return {
             "columns": columns,
             "table": table,
             "schema": schema
         }
-    except Exception as e:
+    
+    # Serve repeated calls from the metadata cache
+    return await _describe_cache.get_or_load(("describe-table", schema, table), load_description)
+
+# Get table structure
+async def describe_table(
+    params: Dict[str, Any]
+) -> Dict[str, Any]:
+    """Get table structure"""
+    schema = params.get("schema", get_settings().PRESTO_SCHEMA)
+    table = params.get("table")
+    
+    if not table:
         return {
-            "error": str(e),
-            "traceback": traceback.format_exc()
+            "error": "Table name is required"
         }
+    
+    # A list of tables is described concurrently
+    if isinstance(table, list):
+        return await describe_tables({"schema": schema, "tables": table})
+    
+    # Only plain names are interpolated into the metadata queries
+    if not _SCHEMA_IDENT(schema):
+        return {
+            "error": f"Invalid schema name: {schema!r}"
+        }
+    if not _IDENT(table):
+        return {
+            "error": f"Invalid table name: {table!r}"
+        }
+    
+    return await _describe(schema, table)
+
+# Get the structure of several tables
+async def describe_tables(
+    params: Dict[str, Any]
+) -> Dict[str, Any]:
+    """Get the structure of several tables, running their DESCRIBE queries concurrently"""
+    schema = params.get("schema", get_settings().PRESTO_SCHEMA)
+    tables = params.get("tables")
+    
+    if not tables or not isinstance(tables, list):
+        return {
+            "error": "A list of table names is required"
+        }
+    
+    # Only plain names are interpolated into the metadata queries
+    if not _SCHEMA_IDENT(schema):
+        return {
+            "error": f"Invalid schema name: {schema!r}"
+        }
+    invalid = [t for t in tables if not isinstance(t, str) or not _IDENT(t)]
+    if invalid:
+        return {
+            "error": f"Invalid table names: {invalid!r}"
+        }
+    
+    # One DESCRIBE per distinct table, all in flight at once (bounded by the executor)
+    tables = list(dict.fromkeys(tables))
+    results = await asyncio.gather(
+        *(_describe(schema, table) for table in tables), return_exceptions=True)
+    
+    described: Dict[str, Any] = {}
+    errors: Dict[str, str] = {}
+    for table, result in zip(tables, results):
+        if isinstance(result, BaseException):
+            errors[table] = str(result)
+        else:
+            described[table] = result["columns"]
+    
+    response = {
+        "tables": described,
+        "schema": schema
+    }
+    if errors:
+        response["errors"] = errors
+    return response
+
+# Get the structure of every table in a schema
+async def describe_schema(
+    params: Dict[str, Any]
+) -> Dict[str, Any]:
+    """Get the structure of all tables in a schema"""
+    schema = params.get("schema", get_settings().PRESTO_SCHEMA)
+    
+    # A catalog prefix is interpolated into the information_schema query
+    if not _SCHEMA_IDENT(schema):
+        return {
+            "error": f"Invalid schema name: {schema!r}"
+        }
+    
+    # Repeated calls for the same schema share one string for the cache key
+    schema = sys.intern(schema)
+    
+    async def load_schema() -> Dict[str, Any]:
+        # Execute query (in a worker thread so the event loop keeps serving other calls)
+        tables = await _run_blocking(PrestoService.describe_schema, schema)
+        
+        return {
+            "tables": tables,
+            "schema": schema
+        }
+    
+    # Serve repeated calls from the metadata cache; describe-table reads it too
+    return await _describe_cache.get_or_load(("describe-schema", schema), load_schema)
+
+# Drop cached metadata
+async def invalidate_metadata_cache(
+    params: Dict[str, Any]
+) -> Dict[str, Any]:
+    """Drop cached table lists and descriptions, for one schema or all of them"""
+    schema = params.get("schema")
+    
+    # Every cache key is (tool name, schema, ...)
+    predicate = None if schema is None else (lambda key: key[1] == schema)
+    invalidated = _tables_cache.clear(predicate) + _describe_cache.clear(predicate)
+    
+    return {
+        "invalidated": invalidated,
+        "schema": schema
+    }
+
+# Health check response when the server is up; filled in by register(), returned as-is
+_HEALTH_RESPONSE: Dict[str, Any] = {}
 
 # Health check
-@app.tool(
-    name="health-check",
-    description="Health Check",
-    annotations=types.ToolAnnotations(
-        title="Health Check",
-        readOnlyHint=True
-    )
-)
 async def health_check(
     params: Dict[str, Any]
 ) -> Dict[str, Any]:
     """Check service health status"""
+    # Shallow checks answer without touching the connection pool
+    if not params.get("deep"):
+        return _HEALTH_RESPONSE
+    
     try:
-        # Try to get a connection to verify Presto connection is normal
-        conn = PrestoService.get_connection()
-        PrestoService.release_connection(conn)
-        status = "healthy"
+        # Run SELECT 1 on a pooled connection to verify Presto connection is normal
+        if not await _run_blocking(PrestoService.ping):
+            raise ValueError("SELECT 1 returned an unexpected result")
     except Exception as e:
-        status = "unhealthy"
         return {
-            "status": status,
-            "service": "mcp-trino-python",
-            "host": PRESTO_HOST,
-            "port": PRESTO_PORT,
-            "schema": PRESTO_SCHEMA,
+            **_HEALTH_RESPONSE,
+            "status": "unhealthy",
             "error": str(e)
         }
     
-    return {
-        "status": status,
-        "service": "mcp-trino-python",
-        "host": PRESTO_HOST,
-        "port": PRESTO_PORT,
-        "schema": PRESTO_SCHEMA
-    }
+    return _HEALTH_RESPONSE
+
+# MCP tools: (name, handler, description, annotations). FastMCP dispatches calls
+# by name from its own tool dict, so this table is only read by register().
+_TOOLS = [
+    (
+        "execute-query",
+        execute_query,
+        "Execute SQL Query",
+        types.ToolAnnotations(
+            title="Execute SQL Query",
+            readOnlyHint=True
+        )
+    ),
+    (
+        "fetch-next",
+        fetch_next,
+        "Fetch the Next Page of a Streamed Query (execute-query with stream=true)",
+        types.ToolAnnotations(
+            title="Fetch Next Page",
+            readOnlyHint=True
+        )
+    ),
+    (
+        "list-tables",
+        list_tables,
+        "List Database Tables",
+        types.ToolAnnotations(
+            title="List Database Tables",
+            readOnlyHint=True
+        )
+    ),
+    (
+        "describe-table",
+        describe_table,
+        "Describe Table Structure",
+        types.ToolAnnotations(
+            title="Describe Table Structure",
+            readOnlyHint=True
+        )
+    ),
+    (
+        "describe-tables",
+        describe_tables,
+        "Describe Several Tables at Once (tables: list of table names)",
+        types.ToolAnnotations(
+            title="Describe Tables",
+            readOnlyHint=True
+        )
+    ),
+    (
+        "describe-schema",
+        describe_schema,
+        "Describe All Tables in a Schema (one query instead of describe-table per table)",
+        types.ToolAnnotations(
+            title="Describe Schema",
+            readOnlyHint=True
+        )
+    ),
+    (
+        "invalidate-metadata-cache",
+        invalidate_metadata_cache,
+        "Invalidate Cached Table Lists and Descriptions (optionally for one schema)",
+        types.ToolAnnotations(
+            title="Invalidate Metadata Cache",
+            readOnlyHint=False,
+            idempotentHint=True
+        )
+    ),
+    (
+        "health-check",
+        health_check,
+        "Health Check (pass deep=true to also run SELECT 1 against Presto/Trino)",
+        types.ToolAnnotations(
+            title="Health Check",
+            readOnlyHint=True
+        )
+    ),
+]
+
+# Register the Trino resource and the tools on the MCP server
+def register(app: FastMCP) -> None:
+    settings = get_settings()
+
+    # Resource and health response depend on the settings, so they are built here
+    # rather than at import time. Neither changes afterwards: the resource content is
+    # serialized once and served as static text.
+    app.add_resource(TextResource(
+        uri=f"trino://{settings.PRESTO_HOST}:{settings.PRESTO_PORT}/{settings.PRESTO_SCHEMA}",
+        name=f"Trino Database ({settings.PRESTO_SCHEMA})",
+        description="Trino SQL database connection",
+        text=pydantic_core.to_json({
+            "host": settings.PRESTO_HOST,
+            "port": settings.PRESTO_PORT,
+            "schema": settings.PRESTO_SCHEMA
+        }, indent=2).decode()
+    ))
+
+    _HEALTH_RESPONSE.update(
+        status="healthy",
+        service="mcp-trino-python",
+        host=settings.PRESTO_HOST,
+        port=settings.PRESTO_PORT,
+        schema=settings.PRESTO_SCHEMA
+    )
+
+    # _tool_handler serializes responses as compact JSON (instead of FastMCP's indented
+    # default) and turns exceptions into error responses
+    for name, handler, description, annotations in _TOOLS:
+        app.add_tool(_tool_handler(handler), name=name, description=description, annotations=annotations)
+
+class _CoalescingStdout:
+    """
+    Async text stream for stdio_server that batches responses into fewer writes.
+
+    stdio_server writes and flushes every message on its own, each costing a
+    worker-thread hop and a syscall. Here write() only fills a buffer and flush()
+    writes it out once it holds max_buffer characters, or otherwise after delay
+    seconds, so a burst of responses goes out in one write. If a timed write
+    fails, its error is raised from the next write(), flush() or drain() call, so
+    stdio_server's writer stops just as it would on a direct write error.
+    """
+
+    def __init__(self, stream: "anyio.AsyncFile[str]", delay: float = 0.001, max_buffer: int = 65536):
+        self._stream = stream
+        self._delay = delay
+        self._max_buffer = max_buffer
+        self._buffer: List[str] = []
+        self._size = 0
+        # Timed flush scheduled by flush(), if any
+        self._pending: Optional[asyncio.Task] = None
+        # Keeps chunks in order when a size-triggered and a timed flush overlap
+        self._lock = asyncio.Lock()
+        # First write error; the stream is unusable after it
+        self._error: Optional[BaseException] = None
+
+    def _check(self) -> None:
+        if self._error is not None:
+            raise self._error
+
+    async def write(self, data: str) -> None:
+        self._check()
+        self._buffer.append(data)
+        self._size += len(data)
+
+    async def flush(self) -> None:
+        self._check()
+        if self._size >= self._max_buffer:
+            await self.drain()
+        elif self._pending is None:
+            self._pending = asyncio.create_task(self._flush_later())
+
+    async def _flush_later(self) -> None:
+        await asyncio.sleep(self._delay)
+        self._pending = None
+        try:
+            await self.drain()
+        except Exception:
+            # Kept in self._error and raised to the next caller
+            pass
+
+    async def drain(self) -> None:
+        """Write out everything buffered so far."""
+        async with self._lock:
+            self._check()
+            if not self._buffer:
+                return
+            # Responses buffered while this write is in flight stay for the next one
+            count = len(self._buffer)
+            data = "".join(self._buffer[:count])
+            try:
+                await self._stream.write(data)
+                await self._stream.flush()
+            except Exception as e:
+                self._error = e
+                raise
+            del self._buffer[:count]
+            self._size -= len(data)
 
 # Prevent signal handler from being called multiple times
 _is_shutting_down = False
+_shutdown_task: Optional[asyncio.Task] = None
 is_valid = False
 
-# Define signal handler
+# Seconds to wait for buffered responses and pool cleanup before exiting on a signal
+SHUTDOWN_TIMEOUT = 5
+
+# Define signal handler (fallback for event loops without add_signal_handler, i.e. Windows)
 def signal_handler(sig, frame):
     global _is_shutting_down
     if _is_shutting_down:
@@ -199,50 +635,122 @@ def signal_handler(sig, frame):
     _is_shutting_down = True
     if is_valid:
         PrestoService.close_all()
-    print("\n👋 Gracefully shutting down the server...")
+    logger.info("👋 Gracefully shutting down the server...")
     
     # Simple direct exit method, avoiding event loop problems
     sys.exit(0)
 
+def _request_shutdown(stdout: "_CoalescingStdout") -> None:
+    """Signal callback run on the event loop: schedule a clean shutdown, or force exit on a second signal."""
+    global _is_shutting_down, _shutdown_task
+    if _is_shutting_down:
+        logger.warning("Second signal received, exiting without waiting for cleanup")
+        os._exit(1)
+    
+    _is_shutting_down = True
+    logger.info("👋 Gracefully shutting down the server...")
+    # Referenced so the task cannot be garbage-collected before it runs
+    _shutdown_task = asyncio.ensure_future(_shutdown(stdout))
+
+async def _cleanup(stdout: "_CoalescingStdout") -> None:
+    # Send responses still buffered, then close Presto connections and open streams
+    await stdout.drain()
+    if is_valid:
+        # Not _run_blocking: all of its workers may be busy with long-running queries
+        await asyncio.get_running_loop().run_in_executor(None, PrestoService.close_all)
+
+async def _shutdown(stdout: "_CoalescingStdout") -> None:
+    try:
+        await asyncio.wait_for(_cleanup(stdout), SHUTDOWN_TIMEOUT)
+    except asyncio.TimeoutError:
+        logger.warning("Cleanup did not finish within %ss, exiting anyway", SHUTDOWN_TIMEOUT)
+    except Exception as e:
+        logger.warning("Error during shutdown: %s", e)
+    logging.shutdown()
+    
+    # stdio_server reads stdin in a worker thread that cannot be cancelled, so
+    # exit directly rather than waiting for the client to close stdin
+    os._exit(0)
+
 # Main function
 async def main():
-    # Register signal handlers
-    signal.signal(signal.SIGINT, signal_handler)
-    signal.signal(signal.SIGTERM, signal_handler)
+    settings = get_settings()
+
+    # Log to stderr: stdout carries the MCP stdio protocol
+    logging.basicConfig(
+        level=logging.DEBUG if settings.VERBOSE else logging.INFO,
+        format="%(message)s",
+        stream=sys.stderr,
+    )
+
+    # Serve over stdio like FastMCP.run_stdio_async, but with batched stdout writes
+    stdout = _CoalescingStdout(anyio.wrap_file(TextIOWrapper(sys.stdout.buffer, encoding="utf-8")))
+
+    # Register signal handlers on the event loop, so shutdown runs between tool calls
+    # instead of raising SystemExit wherever the loop happens to be
+    loop = asyncio.get_running_loop()
+    try:
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(sig, _request_shutdown, stdout)
+    except NotImplementedError:
+        signal.signal(signal.SIGINT, signal_handler)
+        signal.signal(signal.SIGTERM, signal_handler)
 
     global is_valid
     
     # Print current configuration
     print_config()
+
+    # Register the resource and tools
+    register(app)
     
     # Check connection during initialization
     if not is_valid:
         try:
-            print("Checking connection to Presto/Trino server...")
-            conn = PrestoService.get_connection()
-            PrestoService.release_connection(conn)
+            logger.info("Checking connection to Presto/Trino server...")
+            check_host_connectivity(
+                settings.PRESTO_HOST, settings.PRESTO_PORT, settings.CONNECT_TIMEOUT)
+            # Open min_conn connections in parallel so the first tool call finds them warm
+            pool = get_connection_pool()
+            opened = await asyncio.gather(
+                *(_run_blocking(pool.open_connection) for _ in range(pool.min_conn)))
+            if not any(opened):
+                raise ValueError("No connection could be verified with SELECT 1")
             is_valid = True
-            print("✅ Server is ready to use! Presto/Trino connection verified.")
+            logger.info("✅ Server is ready to use! Presto/Trino connection verified.")
         except Exception as e:
-            print("⚠️ WARNING: Failed to connect to Presto/Trino server:")
-            print(f"    Error: {str(e)}")
-            print("    Server will continue to run, but commands may fail.")
-            print("    Please check your connection parameters.")
-            time.sleep(5)
+            logger.warning("⚠️ WARNING: Failed to connect to Presto/Trino server:")
+            logger.warning("    Error: %s", e)
+            logger.warning("    Server will continue to run, but commands may fail.")
+            logger.warning("    Please check your connection parameters.")
+            await asyncio.sleep(5)
     
-    # Use FastMCP's async stdio method
-    await app.run_stdio_async()
+    try:
+        async with stdio_server(stdout=stdout) as (read_stream, write_stream):
+            await app._mcp_server.run(
+                read_stream,
+                write_stream,
+                app._mcp_server.create_initialization_options()
+            )
+    finally:
+        await stdout.drain()
 
 if __name__ == "__main__":
+    # Use uvloop's libuv-based event loop when it is installed
+    try:
+        import uvloop
+        run = uvloop.run
+    except ImportError:
+        run = asyncio.run
+    
     try:
-        asyncio.run(main())
+        run(main())
     except KeyboardInterrupt:
         # Already handled by signal handler, no additional code needed
         pass
     except Exception as e:
         try:
-            print(f"❌ Fatal error: {str(e)}")
-            traceback.print_exc()
+            logger.exception("❌ Fatal error: %s", e)
         except:
             # Prevent I/O errors during shutdown
             pass 